@@ -4,8 +4,14 @@ import pandas as pd
 
 # Backend functions
 from main import analyze_report, enrich_mutations_with_clinvar, load_clinvar_table
+from result_store import ResultStore
 df_clinvar = load_clinvar_table()
 
+# Хранилище результатов: повторная загрузка того же файла не запускает анализ заново
+@st.cache_resource
+def get_result_store():
+    return ResultStore()
+
 # Предварительная загрузка параметров классифкации и клин вопросов
 CLASSIFICATION_OPTIONS = [
     "Benign/Likely Benign",
@@ -81,7 +87,8 @@ if uploaded_file and st.session_state.result is None:
         progress_callback=lambda i, total: (
             progress_bar.progress(int((i / total) * 100)),
             progress_text.write(f"Обрабатывается сегмент {i} из {total}")
-        )
+        ),
+        store=get_result_store()
     )
 
 
@@ -206,7 +213,7 @@ if st.session_state.result is not None:
 
                 rows.append({"field": key, "value": text_value, "type": "mutations"})
 
-            elif key != "nlrp3_mutations_detailed":
+            elif key not in ["nlrp3_mutations_detailed", "merge_details"]:
                 rows.append({"field": key, "value": value, "type": "bool"})
         
         df_display = pd.DataFrame(rows)
@@ -238,6 +245,17 @@ if st.session_state.result is not None:
         if not st.session_state.edit_mode:
             st.subheader("🩺 Данные клинического анализа")
             st.table(df_display)
+
+            # Поля, по которым фрагменты документа противоречили друг другу
+            for key, info in result.get("merge_details", {}).items():
+                if not info.get("conflict"):
+                    continue
+                if result.get(key) != info.get("value"):
+                    # Противоречие не разрешилось автоматически — значение указал пользователь
+                    st.caption(f"⚠️ {key}: в документе есть противоречивые данные, значение {result.get(key)} указано вручную")
+                else:
+                    how = "повторный запрос к ИИ" if info.get("resolved_by") == "requery" else f"политика {info.get('policy')}"
+                    st.caption(f"⚠️ {key}: в документе есть противоречивые данные, итоговое значение {result.get(key)} ({how})")
             st.divider() 
             st.subheader("🧬 Детализированные варианты NLRP3") 
             st.table(df_detailed)
@@ -414,6 +432,8 @@ if st.session_state.result is not None:
                         new_json[key] = value
 
                 new_json["nlrp3_mutations_detailed"] = edited_detailed
+                # Сведения об объединении сохраняем, чтобы подписи о противоречиях не пропадали
+                new_json["merge_details"] = result.get("merge_details", {})
 
                 # Compare mutations
                 old_mut = result.get("nlrp3_mutations")
@@ -0,0 +1,107 @@
+import argparse
+import time
+from pathlib import Path
+
+import docx
+from pypdf import PdfReader
+
+from text_extraction import extract_docx_segments, extract_pdf_segments
+
+# ---------- Сравнение скорости извлечения текста ----------
+# Запуск: python benchmark_extraction.py файл1.pdf файл2.docx ... [--repeat 5] [--workers 4]
+# Для каждого файла сравнивается прежний способ (PyPDFLoader / только абзацы DOCX)
+# с text_extraction.py: время, пропускная способность и объём извлечённого текста.
+# PDF новым способом измеряется дважды: в одном процессе (--workers 1) и с
+# параллельным разбором страниц. Пропускная способность у всех строк в одних
+# единицах: страниц/с для PDF, блоков (абзацы + таблицы)/с для DOCX.
+
+
+# Прежние реализации из main.py — оставлены здесь только для сравнения
+def legacy_extract_text_pdf(path: str) -> str:
+    from langchain_community.document_loaders import PyPDFLoader
+
+    pages = PyPDFLoader(path).load()
+    text_parts = []
+    for page in pages:
+        txt = page.page_content.strip()
+        if txt:
+            text_parts.append(txt)
+    return "".join(text_parts).replace("\n", " ")
+
+
+def legacy_extract_text_docx(path: str) -> str:
+    doc = docx.Document(path)
+    return "\n\n".join(p.text for p in doc.paragraphs if p.text.strip())
+
+
+def measure(func, path, repeat):
+    # Прогрев без замера: ленивый импорт langchain и прочие разовые затраты
+    # не должны попадать в сравнение скорости извлечения
+    result = func(path)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(path)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def count_units(path: str):
+    # Одинаковый знаменатель для прежнего и нового способа
+    if Path(path).suffix.lower() == ".pdf":
+        return len(PdfReader(path).pages), "pages/s"
+    doc = docx.Document(path)
+    return len(doc.paragraphs) + len(doc.tables), "blocks/s"
+
+
+def bench_file(path: str, repeat: int, workers):
+    suffix = Path(path).suffix.lower()
+    if suffix == ".pdf":
+        methods = [
+            ("legacy", legacy_extract_text_pdf),
+            ("native-1", lambda p: extract_pdf_segments(p, workers=1)[0]),
+        ]
+        if workers != 1:
+            methods.append((f"native-{workers or 'auto'}",
+                            lambda p: extract_pdf_segments(p, workers=workers)[0]))
+    elif suffix in [".docx", ".doc"]:
+        methods = [
+            ("legacy", legacy_extract_text_docx),
+            ("native", lambda p: extract_docx_segments(p)[0]),
+        ]
+    else:
+        raise ValueError("Поддерживаются только PDF и DOCX")
+
+    rows = []
+    for method, func in methods:
+        try:
+            seconds, text = measure(func, path, repeat)
+        except ImportError as e:
+            print(f"{path}: {method} недоступен ({e})")
+            continue
+        rows.append((method, seconds, len(text)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк извлечения текста из PDF/DOCX")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="число процессов для PDF (по умолчанию по числу ядер)")
+    args = parser.parse_args()
+
+    print(f"{'file':<40} {'method':<12} {'best, s':>9} {'rate':>10} {'unit':<9} {'chars':>9} {'vs legacy':>9}")
+    for path in args.paths:
+        n_units, unit = count_units(path)
+        rows = bench_file(path, args.repeat, args.workers)
+        baseline = rows[0][1] if rows and rows[0][0] == "legacy" else None
+        for method, seconds, n_chars in rows:
+            rate = n_units / seconds if seconds else float("inf")
+            speedup = f"x{baseline / seconds:.2f}" if baseline and seconds else "-"
+            print(f"{Path(path).name:<40} {method:<12} {seconds:9.4f} {rate:10.1f} {unit:<9} "
+                  f"{n_chars:9d} {speedup:>9}")
+
+
+if __name__ == "__main__":
+    main()
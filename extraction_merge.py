@@ -0,0 +1,223 @@
+import re
+from bisect import bisect_right
+
+# ---------- Объединение ответов LLM по чанкам ----------
+# Каждый ответ модели по чанку превращается в "голос" по каждому полю:
+# значение, уверенность, смещения чанка в исходном тексте, найденные в чанке
+# упоминания признака (evidence) с указанием страницы/абзаца/таблицы документа
+# и дата записи, к которой относится упоминание.
+# Противоречия (например, CRP в норме при поступлении и повышен позже) больше
+# не перезаписываются последним чанком, а разрешаются выбранной политикой.
+
+BOOL_FIELDS = [
+    "crp_elevated", "saa_elevated", "hives", "triggers",
+    "sensorineural_hearing_loss", "aseptic_meningitis",
+    "skeletal_abnormalities", "eye_lesions"
+]
+
+# Ключевые слова для поиска фрагментов текста, на которые опирается ответ
+FIELD_KEYWORDS = {
+    "crp_elevated": r"CRP|СРБ|С[-\s]?реактивн\w*",
+    "saa_elevated": r"\bSAA\b|амилоид\w*",
+    "hives": r"крапивниц\w*|уртикар\w*|urticaria|сып\w*",
+    "triggers": r"триггер\w*|провоцир\w*|холод\w*|переохлажд\w*|стресс\w*",
+    "sensorineural_hearing_loss": r"тугоухост\w*|снижени\w* слуха|потер\w* слуха|hearing",
+    "aseptic_meningitis": r"менингит\w*|meningitis",
+    "skeletal_abnormalities": r"эпифиз\w*|лобн\w* бугр\w*|скелет\w*|костн\w*",
+    "eye_lesions": r"конъ?юнктивит\w*|увеит\w*|склерит\w*|эписклерит\w*|папиллит\w*",
+}
+
+DATE_PATTERN = re.compile(r"\b(\d{1,2})[./](\d{1,2})[./](\d{4}|\d{2})\b")
+
+# any_positive — признак есть, если хотя бы один фрагмент его подтверждает
+#   (соответствует критериям CAPS: достаточно задокументированного эпизода);
+# latest_dated — берётся значение из самой поздней датированной записи;
+# majority     — взвешенное по уверенности большинство голосов.
+MERGE_POLICIES = ("any_positive", "latest_dated", "majority")
+DEFAULT_MERGE_POLICY = "any_positive"
+
+# Уверенность голоса: ответ подкреплён упоминанием признака в чанке или нет
+CONFIDENCE_WITH_EVIDENCE = 1.0
+CONFIDENCE_WITHOUT_EVIDENCE = 0.5
+
+
+def locate_segment(segments: list, pos: int, seg_starts=None):
+    # Сегмент документа (страница, абзац, таблица), в который попадает позиция;
+    # seg_starts — заранее построенный список начал сегментов
+    if not segments:
+        return None
+    if seg_starts is None:
+        seg_starts = [seg["start"] for seg in segments]
+    i = bisect_right(seg_starts, pos) - 1
+    if i < 0 or pos >= segments[i]["end"]:
+        return None
+    return {"kind": segments[i]["kind"], "index": segments[i]["index"]}
+
+
+def find_evidence(text: str, field: str, start: int, end: int, segments=None,
+                  seg_starts=None) -> list:
+    pattern = FIELD_KEYWORDS.get(field)
+    if not pattern:
+        return []
+    if segments and seg_starts is None:
+        seg_starts = [seg["start"] for seg in segments]
+    return [
+        {"start": start + m.start(), "end": start + m.end(),
+         "segment": locate_segment(segments, start + m.start(), seg_starts)}
+        for m in re.finditer(pattern, text[start:end], flags=re.IGNORECASE)
+    ]
+
+
+def index_dates(text: str):
+    # Один проход по тексту: (начала, концы, даты ISO) только корректных дат
+    starts, ends, dates = [], [], []
+    for m in DATE_PATTERN.finditer(text):
+        day, month, year = (int(g) for g in m.groups())
+        if len(m.group(3)) == 2:
+            year += 2000
+        if not (1 <= day <= 31 and 1 <= month <= 12):
+            continue
+        starts.append(m.start())
+        ends.append(m.end())
+        dates.append(f"{year:04d}-{month:02d}-{day:02d}")
+    return starts, ends, dates
+
+
+def date_before(date_index, pos: int, start: int = 0):
+    # Последняя корректная дата, целиком стоящая до позиции и не раньше start
+    starts, ends, dates = date_index
+    i = bisect_right(ends, pos) - 1
+    if i < 0 or starts[i] < start:
+        return None
+    return dates[i]
+
+
+def find_date_before(text: str, pos: int, start: int = 0):
+    # Последняя дата перед позицией (не раньше start) — дата записи, к которой относится упоминание
+    return date_before(index_dates(text), pos, start)
+
+
+def date_vote(date_index, evidence: list, start: int, end: int):
+    # Голос датируется самой поздней записью среди его упоминаний;
+    # anchor — позиция этого упоминания, по ней же разрешается равенство дат.
+    # Голос без упоминаний датируется только датами внутри своего чанка
+    if not evidence:
+        return date_before(date_index, end, start), start
+    dated = [(date_before(date_index, ev["start"]), ev["start"]) for ev in evidence]
+    with_date = [d for d in dated if d[0] is not None]
+    if with_date:
+        return max(with_date)
+    return None, evidence[-1]["start"]
+
+
+def collect_votes(partials: list, text: str, spans: list, segments=None) -> dict:
+    votes = {field: [] for field in BOOL_FIELDS}
+    # Даты и начала сегментов индексируются один раз на документ
+    date_index = index_dates(text)
+    seg_starts = [seg["start"] for seg in segments] if segments else None
+    for i, (partial, (start, end)) in enumerate(zip(partials, spans)):
+        # Перекрытие с предыдущим чанком уже учтено в его голосе
+        own_start = max(start, spans[i - 1][1]) if i > 0 else start
+        for field in BOOL_FIELDS:
+            value = partial.get(field)
+            if value not in [True, False]:
+                continue
+            evidence = find_evidence(text, field, own_start, end, segments, seg_starts)
+            date, anchor = date_vote(date_index, evidence, start, end)
+            votes[field].append({
+                "chunk": i,
+                "value": value,
+                "confidence": CONFIDENCE_WITH_EVIDENCE if evidence else CONFIDENCE_WITHOUT_EVIDENCE,
+                "start": start,
+                "end": end,
+                "evidence": evidence,
+                "date": date,
+                "anchor": anchor,
+            })
+    return votes
+
+
+def resolve_field(votes: list, policy: str = DEFAULT_MERGE_POLICY):
+    # Возвращает (значение, есть_ли_противоречие)
+    if policy not in MERGE_POLICIES:
+        raise ValueError(f"Неизвестная политика объединения: {policy}")
+    if not votes:
+        return "unknown", False
+
+    values = {v["value"] for v in votes}
+    if len(values) == 1:
+        return values.pop(), False
+
+    if policy == "any_positive":
+        return True, True
+
+    if policy == "latest_dated":
+        # Побеждает самая поздняя запись; при одинаковой дате — более поздний фрагмент.
+        # Если хоть один голос подкреплён упоминанием, голоса без упоминаний не учитываются.
+        # Без дат противоречие не разрешается и уходит на повторный запрос
+        if any(v["evidence"] for v in votes):
+            votes = [v for v in votes if v["evidence"]]
+        dated = [v for v in votes if v["date"] is not None]
+        if not dated:
+            return "unknown", True
+        latest = max(dated, key=lambda v: (v["date"], bool(v["evidence"]), v["anchor"]))
+        return latest["value"], True
+
+    # majority: взвешенное по уверенности большинство, ничья остаётся неизвестной
+    score_true = sum(v["confidence"] for v in votes if v["value"] is True)
+    score_false = sum(v["confidence"] for v in votes if v["value"] is False)
+    if score_true == score_false:
+        return "unknown", True
+    return score_true > score_false, True
+
+
+def merge_extractions(partials: list, text: str, spans: list, policy=DEFAULT_MERGE_POLICY,
+                      segments=None):
+    # policy — строка для всех полей или словарь {поле: политика};
+    # segments — позиции страниц/абзацев/таблиц из load_document
+    votes = collect_votes(partials, text, spans, segments)
+    merged = {}
+    details = {}
+    for field in BOOL_FIELDS:
+        field_policy = policy.get(field, DEFAULT_MERGE_POLICY) if isinstance(policy, dict) else policy
+        value, conflict = resolve_field(votes[field], field_policy)
+        merged[field] = value
+        details[field] = {
+            "value": value,
+            "policy": field_policy,
+            "conflict": conflict,
+            "resolved_by": "policy" if conflict and value != "unknown" else None,
+            "votes": votes[field],
+        }
+
+    # Мутации объединяем без потерь, в порядке появления
+    mutations = []
+    for partial in partials:
+        for m in partial.get("nlrp3_mutations", []) or []:
+            if m not in mutations:
+                mutations.append(m)
+    merged["nlrp3_mutations"] = mutations
+    return merged, details
+
+
+def conflict_context(text: str, details: dict, window: int = 300):
+    # Собираем только фрагменты вокруг противоречий, которые политика не разрешила,
+    # чтобы переспросить модель по ним, а не по всему документу
+    intervals = []
+    for info in details.values():
+        if not info["conflict"] or info["value"] != "unknown":
+            continue
+        for vote in info["votes"]:
+            for ev in vote["evidence"] or [vote]:
+                intervals.append([max(0, ev["start"] - window), min(len(text), ev["end"] + window)])
+    if not intervals:
+        return "", []
+
+    intervals.sort()
+    merged = [intervals[0]]
+    for s, e in intervals[1:]:
+        if s <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], e)
+        else:
+            merged.append([s, e])
+    return "\n...\n".join(text[s:e] for s, e in merged), merged
@@ -1,5 +1,3 @@
-from langchain_community.document_loaders import PyPDFLoader
-import docx
 import easyocr
 import requests
 import re
@@ -10,67 +8,89 @@ import pandas as pd
 import easyocr 
 import numpy as np 
 from pdf2image import convert_from_path
+from result_store import hash_file, hash_text
+from text_extraction import EXTRACTOR_VERSION, extract_docx_segments, extract_pdf_segments, join_segments
+from extraction_merge import DEFAULT_MERGE_POLICY, conflict_context, merge_extractions
 
 # ---------- 1. Извлечение текста ----------
 def extract_text_pdf(path: str) -> str: 
-    pages = PyPDFLoader(path).load() 
-    text_parts = [] 
-    for page in pages: 
-        txt = page.page_content.strip()
-        if txt: 
-            text_parts.append(txt) 
-    return "".join(text_parts).replace("\n", " ")
+    text, _ = extract_pdf_segments(path)
+    return text
 
 def extract_text_docx(path: str) -> str:
-    doc = docx.Document(path)
-    return "\n\n".join(p.text for p in doc.paragraphs if p.text.strip())
+    text, _ = extract_docx_segments(path)
+    return text
 
 # OCR fallback for scanned PDF pages
 
-def ocr_pdf(path, lang=None):
+def ocr_pdf_segments(path, lang=None):
     if lang is None:
         lang = ['ru', 'en']
 
     reader = easyocr.Reader(lang, gpu=False)
     images = convert_from_path(path, dpi=300)
 
-    all_text = []
+    parts = []
 
-    for img in images:
+    for i, img in enumerate(images):
         img_array = np.array(img)
         results = reader.readtext(img_array, detail=0)
 
         if results:
-            all_text.append("\n".join(results))
+            parts.append(("page", i, "\n".join(results)))
+
+    return join_segments(parts, "\n\n")
 
-    return "\n\n".join(all_text)
+def ocr_pdf(path, lang=None):
+    text, _ = ocr_pdf_segments(path, lang)
+    return text
 
 
 
-def load_document(path: str) -> str:
+def load_document(path: str, store=None, file_hash=None) -> tuple[str, list]:
+    # Возвращает текст и сегменты (страницы, абзацы, таблицы) с позициями в тексте
     p = Path(path)
-    if p.suffix.lower() in ['.pdf']:
-        text = extract_text_pdf(path)
-        if len(text.strip()) < 50:  # вероятно скан — делаем OCR
-            text = ocr_pdf(path)
-        return text
-    elif p.suffix.lower() in ['.docx', '.doc']:
-        return extract_text_docx(path)
-    else:
+    if p.suffix.lower() not in ['.pdf', '.docx', '.doc']:
         raise ValueError("Поддерживаются только PDF и DOCX")
+
+    # Текст и OCR кэшируются отдельно: они не зависят ни от модели, ни от промпта
+    if store is not None and file_hash is None:
+        file_hash = hash_file(path)
+
+    doc = store.get(file_hash, "text", params=EXTRACTOR_VERSION) if store is not None else None
+    if doc is None:
+        if p.suffix.lower() == '.pdf':
+            text, segments = extract_pdf_segments(path)
+        else:
+            text, segments = extract_docx_segments(path)
+        doc = {"text": text, "segments": segments}
+        if store is not None:
+            store.put(file_hash, "text", doc, params=EXTRACTOR_VERSION)
+
+    if p.suffix.lower() == '.pdf' and len(doc["text"].strip()) < 50:  # вероятно скан — делаем OCR
+        doc = store.get(file_hash, "ocr", params=EXTRACTOR_VERSION) if store is not None else None
+        if doc is None:
+            text, segments = ocr_pdf_segments(path)
+            doc = {"text": text, "segments": segments}
+            if store is not None:
+                store.put(file_hash, "ocr", doc, params=EXTRACTOR_VERSION)
+    return doc["text"], doc["segments"]
     
-def split_into_chunks(text: str, chunk_size: int = 3000, overlap: int = 200) -> list[str]:
-    chunks = []
+def split_into_chunk_spans(text: str, chunk_size: int = 3000, overlap: int = 200) -> list[tuple[int, int]]:
+    # Смещения чанков в исходном тексте — нужны, чтобы ссылаться на источник ответа
+    spans = []
     start = 0
     length = len(text)
 
     while start < length:
         end = start + chunk_size
-        chunk = text[start:end]
-        chunks.append(chunk)
+        spans.append((start, min(end, length)))
         start = end - overlap  
 
-    return chunks
+    return spans
+
+def split_into_chunks(text: str, chunk_size: int = 3000, overlap: int = 200) -> list[str]:
+    return [text[start:end] for start, end in split_into_chunk_spans(text, chunk_size, overlap)]
 
 
 # ---------- 2. Промпт для ChatOllama ----------
@@ -106,6 +126,14 @@ PROMPT_TEMPLATE = """
 >>>
 """
 
+# Версия промпта: при любом изменении PROMPT_TEMPLATE сохранённые ответы LLM устаревают
+PROMPT_VERSION = hash_text(PROMPT_TEMPLATE)[:16]
+
+# Версия обработки после LLM (поиск мутаций regex, нормализация, обогащение ClinVar,
+# объединение чанков). Увеличивать при любом изменении этой логики — иначе из
+# хранилища будут выдаваться итоговые результаты, посчитанные прежним кодом
+PIPELINE_VERSION = "3"
+
 
 # ---------- 3. Вызов ChatOllama через локальный HTTP API ----------
 def call_chatollama(report_text: str, model: str = "gpt-oss") -> dict:
@@ -150,11 +178,17 @@ def find_nlrp3_mutations(text: str) -> list:
 
 
 # ---------- ClinVar загрузка ----------
-def load_clinvar_table(path=".\\db\\db_clinvar_eddited.xlsx"):
+CLINVAR_PATH = ".\\db\\db_clinvar_eddited.xlsx"
+
+def load_clinvar_table(path=CLINVAR_PATH):
     df = pd.read_excel(path)
     df.columns = df.columns.str.strip().str.lower()
     return df
 
+# Версия снимка ClinVar — хэш файла базы, чтобы замена базы сбрасывала обогащённые результаты
+def clinvar_version(path=CLINVAR_PATH) -> str:
+    return hash_file(path)[:16]
+
 
 # ---------- Нормализация номенклатуры ----------
 def normalize_variant_name(raw):
@@ -216,44 +250,66 @@ def enrich_mutations_with_clinvar(mutation_list, df_clinvar):
     return enriched
 
 # ---------- 5. Основной рабочий поток ----------
-def analyze_report(path: str, progress_callback=None):
-    text = load_document(path)
-    # 1. Разбиваем текст на чанки
-    chunks = split_into_chunks(text, chunk_size=3000, overlap=200)
-    total_chunks = len(chunks)
-    # 2. Пустой итоговый результат
-    final = {
-        "crp_elevated": "unknown",
-        "saa_elevated": "unknown",
-        "hives": "unknown",
-        "triggers": "unknown",
-        "sensorineural_hearing_loss": "unknown",
-        "aseptic_meningitis": "unknown",
-        "skeletal_abnormalities": "unknown",
-        "eye_lesions": "unknown",
-        "nlrp3_mutations": []
-    }
-
-    # 3. Обрабатываем каждый чанк
-    for i, chunk in enumerate(chunks, start=1):
-        if progress_callback: progress_callback(i, total_chunks)
-        partial = call_chatollama(chunk, model="gpt-oss")
-
-        # Логика объединения результатов
-
-        for key in [
-            "crp_elevated", "saa_elevated", "hives", "triggers",
-            "sensorineural_hearing_loss", "aseptic_meningitis",
-            "skeletal_abnormalities", "eye_lesions"
-        ]:
-            if partial.get(key) in [True, False]:
-                final[key] = partial[key]
+def analyze_report(path: str, progress_callback=None, store=None, model: str = "gpt-oss",
+                   merge_policy=DEFAULT_MERGE_POLICY, requery_conflicts: bool = True):
+    chunk_size, overlap = 3000, 200
+    params = f"chunk={chunk_size}/{overlap};extractor={EXTRACTOR_VERSION}"
+    policy_key = json.dumps(merge_policy, sort_keys=True)
+    final_params = f"{params};pipeline={PIPELINE_VERSION};merge={policy_key};requery={requery_conflicts}"
+
+    if store is not None:
+        file_hash = hash_file(path)
+        cv_version = clinvar_version()
+        store.invalidate(prompt_version=PROMPT_VERSION, clinvar_version=cv_version)
+        cached = store.get(file_hash, "final", model=model, prompt_version=PROMPT_VERSION,
+                           clinvar_version=cv_version, params=final_params)
+        if cached is not None:
+            if progress_callback: progress_callback(1, 1)
+            return cached
+    else:
+        file_hash = None
 
-        # Мутации
-        muts = partial.get("nlrp3_mutations", []) or []
-        for m in muts:
-            if m not in final["nlrp3_mutations"]:
-                final["nlrp3_mutations"].append(m)
+    text, segments = load_document(path, store=store, file_hash=file_hash)
+    # 1. Разбиваем текст на чанки
+    spans = split_into_chunk_spans(text, chunk_size=chunk_size, overlap=overlap)
+    total_chunks = len(spans)
+
+    # 2. Обрабатываем каждый чанк (ответы LLM берём из хранилища, если они уже есть)
+    partials = None
+    if store is not None:
+        partials = store.get(file_hash, "extraction", model=model,
+                             prompt_version=PROMPT_VERSION, params=params)
+    if partials is None:
+        partials = []
+        for i, (start, end) in enumerate(spans, start=1):
+            if progress_callback: progress_callback(i, total_chunks)
+            partials.append(call_chatollama(text[start:end], model=model))
+        if store is not None:
+            store.put(file_hash, "extraction", partials, model=model,
+                      prompt_version=PROMPT_VERSION, params=params)
+
+    # 3. Объединяем ответы по чанкам с учётом противоречий
+    final, merge_details = merge_extractions(partials, text, spans, policy=merge_policy,
+                                             segments=segments)
+
+    # Противоречия, которые политика не разрешила, переспрашиваем только по спорным фрагментам
+    context, intervals = conflict_context(text, merge_details)
+    if requery_conflicts and context:
+        context_hash = hash_text(context)[:16]
+        answer = None
+        if store is not None:
+            answer = store.get(file_hash, "requery", model=model,
+                               prompt_version=PROMPT_VERSION, params=context_hash)
+        if answer is None:
+            answer = call_chatollama(context, model=model)
+            if store is not None:
+                store.put(file_hash, "requery", answer, model=model,
+                          prompt_version=PROMPT_VERSION, params=context_hash)
+        for key, info in merge_details.items():
+            if info["conflict"] and info["value"] == "unknown" and answer.get(key) in [True, False]:
+                final[key] = info["value"] = answer[key]
+                info["resolved_by"] = "requery"
+                info["requery_spans"] = intervals
 
     #4. Дополнительная валидация/дополнение мутаций
     mutations = final.get("nlrp3_mutations", []) or []
@@ -269,6 +325,10 @@ def analyze_report(path: str, progress_callback=None):
     final["nlrp3_mutations_detailed"] = enrich_mutations_with_clinvar(
         mutations, df_clinvar
     )
+    final["merge_details"] = merge_details
 
+    if store is not None:
+        store.put(file_hash, "final", final, model=model, prompt_version=PROMPT_VERSION,
+                  clinvar_version=cv_version, params=final_params)
 
-    return final
\ No newline at end of file
+    return final
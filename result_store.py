@@ -0,0 +1,164 @@
+import hashlib
+import json
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+# ---------- Локальное хранилище результатов анализа ----------
+# Каждая запись — результат одного этапа обработки документа:
+#   "text"       — текст, извлечённый из PDF/DOCX, и позиции страниц/абзацев/таблиц;
+#   "ocr"        — результат OCR для сканов (с позициями страниц);
+#   "extraction" — ответы LLM по каждому чанку;
+#   "final"      — итоговый словарь после обогащения ClinVar.
+# Ключ записи: хэш содержимого файла + этап + модель + версия промпта +
+# версия снимка ClinVar + прочие параметры (размер чанков и т.п.).
+# Пустая строка в ключе означает, что этап от этого параметра не зависит.
+
+DEFAULT_STORE_PATH = Path("db") / "result_store.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    file_hash TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    model TEXT NOT NULL DEFAULT '',
+    prompt_version TEXT NOT NULL DEFAULT '',
+    clinvar_version TEXT NOT NULL DEFAULT '',
+    params TEXT NOT NULL DEFAULT '',
+    payload TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (file_hash, stage, model, prompt_version, clinvar_version, params)
+)
+"""
+
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_text(text: str) -> str:
+    return hash_bytes(text.encode("utf-8"))
+
+
+def hash_file(path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class ResultStore:
+    def __init__(self, path=DEFAULT_STORE_PATH, max_age_days: float = 30,
+                 max_size_mb: float = 200):
+        self.path = Path(path)
+        self.max_age = max_age_days * 24 * 3600 if max_age_days else None
+        self.max_size = int(max_size_mb * 1024 * 1024) if max_size_mb else None
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(SCHEMA)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries (accessed_at)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        # Отдельное соединение на каждую операцию: Streamlit выполняет скрипт
+        # в разных потоках, а объект соединения sqlite3 между потоками не делится
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, file_hash, stage, model="", prompt_version="",
+            clinvar_version="", params=""):
+        key = (file_hash, stage, model, prompt_version, clinvar_version, params)
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT payload, created_at FROM entries WHERE file_hash=? AND stage=? "
+                "AND model=? AND prompt_version=? AND clinvar_version=? AND params=?",
+                key,
+            ).fetchone()
+            if row is None:
+                return None
+            payload, created_at = row
+            now = time.time()
+            if self.max_age is not None and now - created_at > self.max_age:
+                conn.execute(
+                    "DELETE FROM entries WHERE file_hash=? AND stage=? AND model=? "
+                    "AND prompt_version=? AND clinvar_version=? AND params=?",
+                    key,
+                )
+                return None
+            conn.execute(
+                "UPDATE entries SET accessed_at=? WHERE file_hash=? AND stage=? "
+                "AND model=? AND prompt_version=? AND clinvar_version=? AND params=?",
+                (now, *key),
+            )
+        return json.loads(payload)
+
+    def put(self, file_hash, stage, value, model="", prompt_version="",
+            clinvar_version="", params=""):
+        payload = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (file_hash, stage, model, prompt_version, "
+                "clinvar_version, params, payload, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (file_hash, stage, model, prompt_version, clinvar_version, params,
+                 payload, len(payload.encode("utf-8")), now, now),
+            )
+        self.evict()
+
+    # ---------- Инвалидация ----------
+    def invalidate(self, prompt_version=None, clinvar_version=None):
+        # Удаляем записи, построенные на другой версии промпта или ClinVar
+        with self._connect() as conn:
+            if prompt_version is not None:
+                conn.execute(
+                    "DELETE FROM entries WHERE prompt_version != '' AND prompt_version != ?",
+                    (prompt_version,),
+                )
+            if clinvar_version is not None:
+                conn.execute(
+                    "DELETE FROM entries WHERE clinvar_version != '' AND clinvar_version != ?",
+                    (clinvar_version,),
+                )
+
+    def forget(self, file_hash):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM entries WHERE file_hash=?", (file_hash,))
+
+    # ---------- Вытеснение по возрасту и размеру ----------
+    def evict(self):
+        with self._connect() as conn:
+            if self.max_age is not None:
+                conn.execute(
+                    "DELETE FROM entries WHERE created_at < ?",
+                    (time.time() - self.max_age,),
+                )
+            if self.max_size is None:
+                return
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_size:
+                return
+            # Удаляем давно не использованные записи, пока не уложимся в лимит
+            rows = conn.execute(
+                "SELECT rowid, size FROM entries ORDER BY accessed_at ASC"
+            ).fetchall()
+            to_delete = []
+            for rowid, size in rows:
+                if total <= self.max_size:
+                    break
+                to_delete.append((rowid,))
+                total -= size
+            conn.executemany("DELETE FROM entries WHERE rowid=?", to_delete)
+
+    def size(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
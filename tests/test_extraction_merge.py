@@ -0,0 +1,150 @@
+import pytest
+
+from extraction_merge import (
+    conflict_context, find_date_before, merge_extractions, resolve_field,
+)
+
+
+def vote(value, date=None, anchor=0, confidence=1.0):
+    return {"value": value, "date": date, "anchor": anchor, "confidence": confidence,
+            "evidence": [], "start": 0, "end": 0}
+
+
+# ---------- resolve_field ----------
+def test_no_votes_is_unknown():
+    assert resolve_field([], "majority") == ("unknown", False)
+
+
+def test_agreeing_votes_are_not_a_conflict():
+    assert resolve_field([vote(False), vote(False)], "any_positive") == (False, False)
+
+
+def test_any_positive():
+    assert resolve_field([vote(False), vote(True), vote(False)], "any_positive") == (True, True)
+
+
+def test_latest_dated_picks_latest_record():
+    votes = [vote(True, "2020-01-01", anchor=900), vote(False, "2021-05-05", anchor=100)]
+    assert resolve_field(votes, "latest_dated") == (False, True)
+
+
+def test_latest_dated_same_date_uses_position():
+    votes = [vote(False, "2021-05-05", anchor=500), vote(True, "2021-05-05", anchor=100)]
+    assert resolve_field(votes, "latest_dated") == (False, True)
+
+
+def test_latest_dated_without_dates_is_unresolved():
+    assert resolve_field([vote(True), vote(False)], "latest_dated") == ("unknown", True)
+
+
+def test_majority_weighs_confidence():
+    votes = [vote(True), vote(False, confidence=0.5), vote(False, confidence=0.4)]
+    assert resolve_field(votes, "majority") == (True, True)
+
+
+def test_majority_tie_is_unresolved():
+    votes = [vote(True), vote(False, confidence=0.5), vote(False, confidence=0.5)]
+    assert resolve_field(votes, "majority") == ("unknown", True)
+
+
+def test_unknown_policy_raises():
+    with pytest.raises(ValueError):
+        resolve_field([vote(True)], "last_wins")
+
+
+# ---------- merge_extractions ----------
+def two_chunk_text():
+    # СРБ в норме в первом чанке, повышен во втором; перекрытие чанков 2800–3000
+    text = "x" * 2850 + " 01.01.2020 CRP норма " + "x" * 500 + " 05.05.2021 CRP повышен"
+    spans = [(0, 3000), (2800, len(text))]
+    partials = [{"crp_elevated": False}, {"crp_elevated": True}]
+    return text, spans, partials
+
+
+def test_votes_ignore_evidence_in_overlap():
+    text, spans, partials = two_chunk_text()
+    _, details = merge_extractions(partials, text, spans, "latest_dated")
+    first, second = details["crp_elevated"]["votes"]
+    assert first["date"] == "2020-01-01"
+    assert second["date"] == "2021-05-05"
+    assert all(ev["start"] >= spans[0][1] for ev in second["evidence"])
+
+
+def test_vote_is_dated_by_latest_reading_in_chunk():
+    # В первом чанке два измерения: 2020 повышен, 2022 норма — голос датируется 2022
+    text = ("01.01.2020 CRP 40 " + "x" * 100 + " 01.01.2022 CRP норма " + "x" * 2900
+            + " 01.01.2021 CRP повышен")
+    spans = [(0, 3000), (2800, len(text))]
+    merged, details = merge_extractions(
+        [{"crp_elevated": False}, {"crp_elevated": True}], text, spans, "latest_dated"
+    )
+    assert details["crp_elevated"]["votes"][0]["date"] == "2022-01-01"
+    assert merged["crp_elevated"] is False
+
+
+def test_latest_dated_ignores_chunk_without_mention():
+    # Во втором чанке CRP не упоминается — его ответ не должен перекрывать датированное измерение
+    text = "01.01.2020 CRP 40 мг/л " + "x" * 3500
+    spans = [(0, 3000), (2800, len(text))]
+    merged, details = merge_extractions(
+        [{"crp_elevated": True}, {"crp_elevated": False}], text, spans, "latest_dated"
+    )
+    assert details["crp_elevated"]["votes"][1]["date"] is None
+    assert merged["crp_elevated"] is True
+
+
+def test_latest_dated_evidence_outranks_same_date_without_evidence():
+    with_evidence = vote(True, "2021-05-05", anchor=100)
+    with_evidence["evidence"] = [{"start": 100, "end": 103, "segment": None}]
+    votes = [with_evidence, vote(False, "2021-05-05", anchor=900)]
+    assert resolve_field(votes, "latest_dated") == (True, True)
+
+
+def test_policy_per_field_dict():
+    text, spans, _ = two_chunk_text()
+    partials = [{"crp_elevated": False, "hives": False}, {"crp_elevated": True, "hives": True}]
+    merged, details = merge_extractions(partials, text, spans, {"crp_elevated": "majority"})
+    # У "hives" нет упоминаний в тексте: обе уверенности 0.5, но политика по умолчанию any_positive
+    assert details["hives"]["policy"] == "any_positive"
+    assert merged["hives"] is True
+    assert details["crp_elevated"]["policy"] == "majority"
+    assert merged["crp_elevated"] == "unknown"
+    assert details["crp_elevated"]["resolved_by"] is None
+
+
+def test_evidence_is_tagged_with_document_segment():
+    text, spans, partials = two_chunk_text()
+    segments = [
+        {"kind": "page", "index": 0, "start": 0, "end": 3000},
+        {"kind": "table", "index": 0, "start": 3001, "end": len(text)},
+    ]
+    _, details = merge_extractions(partials, text, spans, segments=segments)
+    first, second = details["crp_elevated"]["votes"]
+    assert first["evidence"][0]["segment"] == {"kind": "page", "index": 0}
+    assert second["evidence"][0]["segment"] == {"kind": "table", "index": 0}
+
+
+def test_mutations_are_merged_in_order():
+    partials = [{"nlrp3_mutations": ["c.1A>G"]}, {"nlrp3_mutations": ["c.2C>T", "c.1A>G"]}]
+    merged, _ = merge_extractions(partials, "abc", [(0, 3), (0, 3)])
+    assert merged["nlrp3_mutations"] == ["c.1A>G", "c.2C>T"]
+
+
+def test_conflict_context_only_for_unresolved():
+    text, spans, partials = two_chunk_text()
+    _, details = merge_extractions(partials, text, spans, "any_positive")
+    assert conflict_context(text, details) == ("", [])
+
+    _, details = merge_extractions(partials, text, spans, "majority")
+    context, intervals = conflict_context(text, details, window=50)
+    assert "CRP норма" in context and "CRP повышен" in context
+    assert len(context) < len(text)
+
+
+def test_find_date_before_two_digit_year():
+    assert find_date_before("осмотр 3.4.21 СРБ", 15) == "2021-04-03"
+
+
+def test_find_date_before_skips_invalid_date():
+    text = "01.02.2020 норма, 12.13.2020 СРБ"
+    assert find_date_before(text, len(text)) == "2020-02-01"
@@ -0,0 +1,82 @@
+import result_store
+from result_store import ResultStore
+
+
+def make_store(tmp_path, **kwargs):
+    return ResultStore(tmp_path / "store.sqlite", **kwargs)
+
+
+def test_put_get_roundtrip(tmp_path):
+    store = make_store(tmp_path)
+    value = {"crp_elevated": True, "nlrp3_mutations": ["c.1049C>T"]}
+    store.put("h1", "final", value, model="gpt-oss", prompt_version="p1",
+              clinvar_version="c1", params="chunk=3000/200")
+
+    assert store.get("h1", "final", model="gpt-oss", prompt_version="p1",
+                     clinvar_version="c1", params="chunk=3000/200") == value
+    # Любая часть ключа отличается — записи нет
+    assert store.get("h1", "final", model="other", prompt_version="p1",
+                     clinvar_version="c1", params="chunk=3000/200") is None
+    assert store.get("h2", "final", model="gpt-oss", prompt_version="p1",
+                     clinvar_version="c1", params="chunk=3000/200") is None
+
+
+def test_put_replaces_existing_entry(tmp_path):
+    store = make_store(tmp_path)
+    store.put("h1", "text", "old")
+    store.put("h1", "text", "new")
+    assert store.get("h1", "text") == "new"
+
+
+def test_expired_entry_is_dropped(tmp_path, monkeypatch):
+    now = 1_000_000.0
+    monkeypatch.setattr(result_store.time, "time", lambda: now)
+    store = make_store(tmp_path, max_age_days=1)
+    store.put("h1", "text", "abc")
+
+    now += 2 * 24 * 3600
+    assert store.get("h1", "text") is None
+    assert store.size() == 0
+
+
+def test_size_eviction_removes_least_recently_used(tmp_path, monkeypatch):
+    now = 1_000_000.0
+    monkeypatch.setattr(result_store.time, "time", lambda: now)
+    # Лимит ~1 КБ: помещаются две записи по 400 байт, но не три
+    store = make_store(tmp_path, max_size_mb=1 / 1024)
+    store.put("a", "text", "a" * 400)
+    now += 1
+    store.put("b", "text", "b" * 400)
+    now += 1
+    assert store.get("a", "text") is not None  # "a" становится самой свежей
+    now += 1
+    store.put("c", "text", "c" * 400)
+
+    assert store.get("b", "text") is None
+    assert store.get("a", "text") is not None
+    assert store.get("c", "text") is not None
+    assert store.size() <= 1024
+
+
+def test_oversized_entry_is_evicted_immediately(tmp_path):
+    store = make_store(tmp_path, max_size_mb=1 / 1024)
+    store.put("h1", "text", "x" * 4096)
+    assert store.get("h1", "text") is None
+
+
+def test_invalidate_drops_other_versions_only(tmp_path):
+    store = make_store(tmp_path)
+    store.put("h1", "text", "raw text")
+    store.put("h1", "extraction", [{}], prompt_version="p1")
+    store.put("h1", "extraction", [{}], prompt_version="p2")
+    store.put("h1", "final", {}, prompt_version="p2", clinvar_version="c1")
+    store.put("h1", "final", {}, prompt_version="p2", clinvar_version="c2")
+
+    store.invalidate(prompt_version="p2", clinvar_version="c2")
+
+    # Этапы, не зависящие от версий, не трогаем
+    assert store.get("h1", "text") == "raw text"
+    assert store.get("h1", "extraction", prompt_version="p1") is None
+    assert store.get("h1", "extraction", prompt_version="p2") == [{}]
+    assert store.get("h1", "final", prompt_version="p2", clinvar_version="c1") is None
+    assert store.get("h1", "final", prompt_version="p2", clinvar_version="c2") == {}
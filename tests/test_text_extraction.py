@@ -0,0 +1,39 @@
+import docx
+
+from text_extraction import extract_docx_segments, join_segments
+
+
+def test_join_segments_offsets_skip_empty_parts():
+    text, segments = join_segments(
+        [("page", 0, "abc"), ("page", 1, ""), ("page", 2, "de")], " "
+    )
+    assert text == "abc de"
+    assert segments == [
+        {"kind": "page", "index": 0, "start": 0, "end": 3},
+        {"kind": "page", "index": 2, "start": 4, "end": 6},
+    ]
+
+
+def test_docx_reads_header_paragraphs_and_tables_in_order(tmp_path):
+    doc = docx.Document()
+    doc.sections[0].header.paragraphs[0].text = "Детская больница, 12.03.2024"
+    doc.add_paragraph("Выписка")
+    table = doc.add_table(rows=2, cols=3)
+    for col, txt in enumerate(["Показатель", "Значение", "Норма"]):
+        table.cell(0, col).text = txt
+    table.cell(1, 0).text = "СРБ"
+    table.cell(1, 1).text = "45 мг/л"
+    table.cell(0, 1).merge(table.cell(0, 2))
+    doc.add_paragraph("")
+    doc.add_paragraph("Заключение: крапивница")
+    path = tmp_path / "report.docx"
+    doc.save(path)
+
+    text, segments = extract_docx_segments(str(path))
+
+    assert [(s["kind"], s["index"]) for s in segments] == [
+        ("header", 0), ("paragraph", 0), ("table", 0), ("paragraph", 2)
+    ]
+    table_seg = segments[2]
+    assert text[table_seg["start"]:table_seg["end"]] == "Показатель | Значение Норма\nСРБ | 45 мг/л"
+    assert text[segments[-1]["start"]:segments[-1]["end"]] == "Заключение: крапивница"
@@ -0,0 +1,120 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import docx
+from docx.table import Table
+from pypdf import PdfReader
+
+# ---------- Извлечение текста без langchain ----------
+# PDF читается напрямую через pypdf (его же использует PyPDFLoader), страницы
+# больших файлов разбираются параллельно в нескольких процессах.
+# DOCX читается в порядке документа: колонтитулы, абзацы и таблицы —
+# в таблицах обычно стоят CRP/SAA, которые раньше терялись.
+# Помимо текста возвращаются сегменты с позициями в итоговой строке:
+# {"kind": "page" | "header" | "paragraph" | "table", "index": i, "start": s, "end": e}
+
+# Версия извлечения: входит в ключ хранилища результатов, чтобы текст,
+# извлечённый прежним способом, не переиспользовался
+EXTRACTOR_VERSION = "native-2"
+
+# Меньше этого числа страниц процессы не запускаем: их старт дороже самого разбора
+PARALLEL_MIN_PAGES = 32
+
+
+def join_segments(parts: list, sep: str):
+    # parts — список (kind, index, text); пустые фрагменты пропускаются
+    text_parts = []
+    segments = []
+    pos = 0
+    for kind, index, txt in parts:
+        if not txt:
+            continue
+        if text_parts:
+            pos += len(sep)
+        text_parts.append(txt)
+        segments.append({"kind": kind, "index": index, "start": pos, "end": pos + len(txt)})
+        pos += len(txt)
+    return sep.join(text_parts), segments
+
+
+# ---------- PDF ----------
+def _extract_pdf_page_range(path: str, start: int, end: int) -> list[str]:
+    # Каждый процесс открывает файл сам: объект PdfReader между процессами не передаётся
+    reader = PdfReader(path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+def extract_pdf_pages(path: str, workers: int | None = None) -> list[str]:
+    reader = PdfReader(path)
+    n_pages = len(reader.pages)
+    workers = workers or min(os.cpu_count() or 1, 8)
+
+    if workers <= 1 or n_pages < PARALLEL_MIN_PAGES:
+        return [page.extract_text() or "" for page in reader.pages]
+
+    step = -(-n_pages // workers)
+    ranges = [(s, min(s + step, n_pages)) for s in range(0, n_pages, step)]
+    try:
+        with ProcessPoolExecutor(max_workers=len(ranges)) as pool:
+            futures = [pool.submit(_extract_pdf_page_range, path, s, e) for s, e in ranges]
+            return [txt for f in futures for txt in f.result()]
+    except (OSError, RuntimeError):
+        # Например, если процессы нельзя запустить в текущем окружении
+        return [page.extract_text() or "" for page in reader.pages]
+
+
+def extract_pdf_segments(path: str, workers: int | None = None):
+    pages = extract_pdf_pages(path, workers=workers)
+    parts = [("page", i, txt.strip().replace("\n", " ")) for i, txt in enumerate(pages)]
+    return join_segments(parts, " ")
+
+
+# ---------- DOCX ----------
+def _table_text(table) -> str:
+    rows = []
+    for row in table.rows:
+        cells = []
+        seen = set()
+        for cell in row.cells:
+            # Объединённые ячейки python-docx возвращает несколько раз
+            if cell._tc in seen:
+                continue
+            seen.add(cell._tc)
+            txt = " ".join(cell.text.split())
+            if txt:
+                cells.append(txt)
+        if cells:
+            rows.append(" | ".join(cells))
+    return "\n".join(rows)
+
+
+def _block_text(block) -> tuple[str, str]:
+    if isinstance(block, Table):
+        return "table", _table_text(block)
+    return "paragraph", block.text.strip()
+
+
+def extract_docx_segments(path: str):
+    doc = docx.Document(path)
+    parts = []
+
+    # Колонтитулы: в шапке часто стоят ФИО, дата и отделение
+    seen_headers = set()
+    for section in doc.sections:
+        header = section.header
+        if header.is_linked_to_previous:
+            continue
+        for block in header.iter_inner_content():
+            _, txt = _block_text(block)
+            if txt and txt not in seen_headers:
+                seen_headers.add(txt)
+                parts.append(("header", len(seen_headers) - 1, txt))
+
+    # Тело документа: абзацы и таблицы в исходном порядке
+    counters = {"paragraph": 0, "table": 0}
+    for block in doc.iter_inner_content():
+        kind, txt = _block_text(block)
+        parts.append((kind, counters[kind], txt))
+        counters[kind] += 1
+
+    return join_segments(parts, "\n\n")